@@ -1,14 +1,22 @@
 import os
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
 import pandas as pd
 from tqdm import tqdm
 import json
 
 from utils import find_missing_data, find_similar_rows, prepare_inference_data
+from cnpj import ConsigneeIndex
+from explanations import ExplanationStore, EXPLANATION_COLUMN, NO_DETAIL_EXPLANATION, VERBOSITY_LEVELS
+from resilience import HedgedInvoker, CircuitBreaker, format_latency_stats
+from prompt_engineering import ExampleBank
+from validation import ValidationEngine
+from writeback import ColumnarWriteBuffer, write_patch
 
 load_dotenv()
 
@@ -16,6 +24,8 @@ load_dotenv()
 INFERENCE_TEMPLATE = """
 Você é um especialista em análise de dados de importação/exportação. Sua tarefa é inferir valores ausentes em registros de importação.
 
+{few_shot_examples}
+
 Registro com dados ausentes:
 {row_data}
 
@@ -25,6 +35,8 @@ As colunas ausentes que precisam ser preenchidas são:
 Aqui estão registros semelhantes de nossos dados históricos que podem ajudar:
 {similar_rows}
 
+{validation_feedback}
+
 Descrição das colunas:
 {column_descriptions}
 
@@ -51,8 +63,45 @@ Por exemplo, se precisa preencher as colunas "transport_mode_pt" e "consignee_co
 }}
 """
 
+# Colunas preenchidas sem o LLM quando o importador tem um único valor conhecido.
+# ncm_code fica de fora: o produto varia entre as importações de uma mesma empresa.
+FAST_FILL_COLUMNS = ["shipper_name", "clearance_place_entry"]
+
+# Modelo da explicação do preenchimento rápido: raiz do CNPJ e número de registros
+# entram como parâmetros, então todos os importadores compartilham uma única entrada
+FAST_FILL_EXPLANATION = "Único valor observado para o importador (raiz do CNPJ {0}) em {1} registros de referência"
+
+class UsageTracker(BaseCallbackHandler):
+    """Callback that accumulates LLM call counts and token usage."""
+    
+    def __init__(self):
+        super().__init__()
+        # Requisições duplicadas (hedge) terminam em threads diferentes
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    def on_llm_end(self, response, **kwargs):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += token_usage.get("prompt_tokens", 0)
+            self.completion_tokens += token_usage.get("completion_tokens", 0)
+
 class DataCompletionAgent:
-    def __init__(self, model_name="gpt-3.5-turbo"):
+    def __init__(self, model_name="gpt-3.5-turbo", example_bank: Optional[ExampleBank] = None,
+                 example_token_budget: int = 600, request_deadline: float = 60.0,
+                 hedge_percentile: float = 95.0, max_hedges: int = 1,
+                 breaker_threshold: float = 0.5, breaker_cooldown: float = 30.0):
         # Carregar a chave API diretamente
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -60,25 +109,55 @@ class DataCompletionAgent:
         
         print(f"Using API key: {api_key[:10]}...{api_key[-5:]}")
         
+        # Contadores de chamadas e tokens, usados na avaliação de custo
+        self.usage = UsageTracker()
+        
         # Inicializar o LLM com a chave API explícita
         self.llm = ChatOpenAI(
             temperature=0, 
             model_name=model_name,
-            openai_api_key=api_key
+            openai_api_key=api_key,
+            request_timeout=request_deadline,
+            callbacks=[self.usage]
         )
         
         self.prompt = PromptTemplate(
-            input_variables=["row_data", "missing_columns", "similar_rows", "column_descriptions"],
+            input_variables=["few_shot_examples", "row_data", "missing_columns", "similar_rows",
+                             "validation_feedback", "column_descriptions"],
             template=INFERENCE_TEMPLATE
         )
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
         
+        # Chamadas ao LLM com prazo por requisição, requisições duplicadas (hedge) após
+        # o percentil de latência e circuit breaker quando a taxa de erros dispara
+        self.invoker = HedgedInvoker(
+            lambda inputs: self.chain.invoke(inputs),
+            deadline=request_deadline,
+            hedge_percentile=hedge_percentile,
+            max_hedges=max_hedges,
+            breaker=CircuitBreaker(error_threshold=breaker_threshold, cooldown=breaker_cooldown)
+        )
+        
+        # Banco de exemplos few-shot (opcional), selecionados por linha dentro do orçamento de tokens
+        self.example_bank = example_bank
+        self.example_token_budget = example_token_budget
+        
+        # Tabela de explicações internadas da última execução de process_dataframe
+        self.explanation_store = ExplanationStore()
+        
     def process_dataframe(self, 
                          target_df: pd.DataFrame, 
                          reference_df: pd.DataFrame, 
                          match_columns: List[str],
                          batch_size: int = 10,
-                         max_similar_rows: int = 5) -> pd.DataFrame:
+                         max_similar_rows: int = 5,
+                         patch_path: Optional[str] = None,
+                         validate: bool = True,
+                         max_reinference_attempts: int = 1,
+                         fast_fill: bool = True,
+                         explanation_verbosity: str = "full",
+                         fast_fill_min_support: int = 3,
+                         consignee_index: Optional[ConsigneeIndex] = None) -> pd.DataFrame:
         """
         Process the target dataframe to fill in missing values using reference data and LLM inference.
         
@@ -86,116 +165,378 @@ class DataCompletionAgent:
             target_df: DataFrame with missing values
             reference_df: Reference DataFrame for finding similar rows
             match_columns: Columns to use for matching similar rows
-            batch_size: Number of rows to process in each batch
+            batch_size: Number of rows whose inferences are validated and written back together
             max_similar_rows: Maximum number of similar rows to include in the prompt
+            patch_path: Optional path of a sparse patch CSV with only the changed cells
+            validate: Reject inferences that fail the reference data validation checks
+            max_reinference_attempts: Number of targeted re-inference rounds for rejected cells
+            fast_fill: Fill columns with a single known value for the consignee without calling the LLM
+            explanation_verbosity: "none" (no explanation column), "short" (compact codes referencing
+                self.explanation_store) or "full" (rendered text)
+            fast_fill_min_support: Minimum number of reference rows behind a fast-filled value
+            consignee_index: Prebuilt ConsigneeIndex for reference_df (built here if not given)
             
         Returns:
             DataFrame with filled missing values
         """
+        if explanation_verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Invalid explanation verbosity: {explanation_verbosity}. "
+                             f"Options: {', '.join(VERBOSITY_LEVELS)}")
+        
         # Make a copy to avoid modifying the original
         result_df = target_df.copy()
         
+        # Explicações internadas: a coluna guarda apenas códigos e o texto completo
+        # é gerado somente quando solicitado
+        self.explanation_store = ExplanationStore()
+        explanation_store = self.explanation_store if explanation_verbosity != "none" else None
+        patch_renderer = self.explanation_store if explanation_verbosity == "full" else None
+        
         # Add a column for explanations
-        result_df['explicacoes_inferencia'] = ""
+        if explanation_store is not None:
+            result_df[EXPLANATION_COLUMN] = ""
         
         # Find rows with missing data
         missing_data_map = find_missing_data(target_df)
         
         print(f"Found {len(missing_data_map)} rows with missing data")
         
+        validator = ValidationEngine.from_reference(reference_df) if validate else None
+        
+        # Índice dos CNPJs normalizados, usado na busca e no preenchimento rápido
+        if consignee_index is None:
+            consignee_index = ConsigneeIndex(reference_df)
+        
+        # Os valores inferidos são acumulados por coluna e aplicados uma vez por lote
+        write_buffer = ColumnarWriteBuffer()
+        pending: Dict[Any, Tuple[Dict[str, Any], Dict[str, str]]] = {}
+        reinference_queue: List[Tuple[Any, List[str], str]] = []
+        # Todos os valores rejeitados por célula, repetidos no feedback de cada nova tentativa
+        rejection_history: Dict[Tuple[Any, str], List[str]] = {}
+        patch_started = False
+        
         # Process rows with missing data
         for idx, missing_cols in tqdm(missing_data_map.items(), desc="Processing rows"):
             row = target_df.iloc[idx]
             
-            # Find similar rows
-            similar = find_similar_rows(row, reference_df, match_columns)
+            fast_values, fast_explanations = {}, {}
+            if fast_fill:
+                fast_values, fast_explanations = self._fast_fill(row, missing_cols, consignee_index,
+                                                                 fast_fill_min_support)
             
-            if len(similar) == 0:
-                print(f"Warning: No similar rows found for row {idx}")
-                continue
+            remaining_cols = [col for col in missing_cols if col not in fast_values]
+            inference = None
+            if remaining_cols:
+                inference = self._infer_row(row, idx, remaining_cols, reference_df, match_columns,
+                                            max_similar_rows, consignee_index=consignee_index)
+            
+            if fast_values:
+                inferred_values, explanations = inference if inference is not None else ({}, {})
+                inference = ({**fast_values, **inferred_values}, {**fast_explanations, **explanations})
+            if inference is not None:
+                pending[idx] = inference
+            
+            if len(pending) >= batch_size:
+                reinference_queue.extend(
+                    self._validate_batch(pending, result_df, validator, write_buffer, explanation_store,
+                                         rejection_history))
+                pending = {}
+                patch_started = self._flush_writes(write_buffer, result_df, patch_path, patch_started,
+                                                   patch_renderer)
+        
+        reinference_queue.extend(
+            self._validate_batch(pending, result_df, validator, write_buffer, explanation_store,
+                                 rejection_history))
+        pending = {}
+        patch_started = self._flush_writes(write_buffer, result_df, patch_path, patch_started,
+                                           patch_renderer)
+        
+        # Reprocessar apenas as células rejeitadas, informando ao LLM o motivo da rejeição
+        for attempt in range(max_reinference_attempts):
+            if not reinference_queue:
+                break
+            
+            queue, reinference_queue = reinference_queue, []
+            print(f"Re-inferring {len(queue)} rows rejected by validation (attempt {attempt + 1})")
+            
+            for idx, rejected_cols, feedback in tqdm(queue, desc="Re-inferring rows"):
+                row = result_df.loc[idx, target_df.columns]
+                inference = self._infer_row(row, idx, rejected_cols, reference_df, match_columns,
+                                            max_similar_rows, validation_feedback=feedback,
+                                            consignee_index=consignee_index)
+                if inference is not None:
+                    pending[idx] = inference
                 
-            # Limit number of similar rows to reduce token usage
-            similar = similar.head(max_similar_rows)
+                if len(pending) >= batch_size:
+                    reinference_queue.extend(
+                        self._validate_batch(pending, result_df, validator, write_buffer, explanation_store,
+                                             rejection_history))
+                    pending = {}
+                    patch_started = self._flush_writes(write_buffer, result_df, patch_path, patch_started,
+                                                       patch_renderer)
             
-            # Prepare data for LLM
-            inference_data = prepare_inference_data(row, missing_cols, similar)
+            reinference_queue.extend(
+                self._validate_batch(pending, result_df, validator, write_buffer, explanation_store,
+                                     rejection_history))
+            pending = {}
+            patch_started = self._flush_writes(write_buffer, result_df, patch_path, patch_started,
+                                               patch_renderer)
+        
+        if reinference_queue:
+            print(f"Warning: {len(reinference_queue)} rows still have inferences rejected by validation; "
+                  "those cells were left empty")
+        
+        if patch_path and not patch_started:
+            # Nenhuma célula alterada: ainda assim geramos um patch (vazio)
+            write_patch(write_buffer.flush(result_df), patch_path)
+        
+        if explanation_verbosity == "full":
+            result_df[EXPLANATION_COLUMN] = self.explanation_store.render_series(result_df[EXPLANATION_COLUMN])
+        
+        print(format_latency_stats(self.invoker.stats()))
+                
+        return result_df
+    
+    def close(self) -> None:
+        """Release the worker threads used for LLM calls."""
+        self.invoker.shutdown()
+    
+    def _infer_row(self,
+                   row: pd.Series,
+                   idx: Any,
+                   missing_cols: List[str],
+                   reference_df: pd.DataFrame,
+                   match_columns: List[str],
+                   max_similar_rows: int,
+                   validation_feedback: str = "",
+                   consignee_index: Optional[ConsigneeIndex] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+        """
+        Infer the missing columns of a single row with the LLM.
+        
+        Returns:
+            Tuple with the inferred values and their explanations, or None if the row could not be inferred
+        """
+        # Find similar rows
+        similar = find_similar_rows(row, reference_df, match_columns, consignee_index=consignee_index)
+        
+        if len(similar) == 0:
+            print(f"Warning: No similar rows found for row {idx}")
+            return None
             
+        # Limit number of similar rows to reduce token usage
+        similar = similar.head(max_similar_rows)
+        
+        # Prepare data for LLM
+        inference_data = prepare_inference_data(row, missing_cols, similar)
+        inference_data["validation_feedback"] = validation_feedback
+        inference_data["few_shot_examples"] = self._few_shot_examples(row, missing_cols)
+        
+        try:
+            # Call LLM to infer missing values
+            response = self.invoker.invoke(inference_data)
+            return self._parse_response(response, missing_cols)
+        except Exception as e:
+            print(f"Error processing row {idx}: {e}")
+            return None
+    
+    def _few_shot_examples(self, row: pd.Series, missing_cols: List[str]) -> str:
+        """Select the few-shot examples block for a row from the example bank."""
+        if self.example_bank is None:
+            return ""
+        
+        examples = self.example_bank.select(row, missing_cols, self.example_token_budget)
+        if not examples:
+            return ""
+        return f"Exemplos de registros completados corretamente:\n\n{examples}"
+    
+    def _fast_fill(self,
+                   row: pd.Series,
+                   missing_cols: List[str],
+                   consignee_index: ConsigneeIndex,
+                   min_support: int) -> Tuple[Dict[str, Any], Dict[str, Tuple[str, Tuple[Any, ...]]]]:
+        """
+        Fill missing columns that have a single known value for the row's consignee (CNPJ root),
+        seen in at least min_support reference rows.
+        
+        Returns:
+            Tuple with the filled values and their explanations, given as
+            (FAST_FILL_EXPLANATION, parameters) for the explanation store
+        """
+        if 'consignee_code' not in row.index:
+            return {}, {}
+        
+        root = consignee_index.root_for(row['consignee_code'])
+        if root is None:
+            return {}, {}
+        
+        values = {}
+        explanations = {}
+        for col in missing_cols:
+            if col not in FAST_FILL_COLUMNS:
+                continue
+            known = consignee_index.known_values(root, col)
+            # Só preenchemos sem o LLM quando o importador tem um único valor conhecido,
+            # observado em registros suficientes para não copiar uma importação isolada
+            if len(known) == 1 and known.iloc[0] >= min_support:
+                values[col] = known.index[0]
+                explanations[col] = (FAST_FILL_EXPLANATION, (f"{root:08d}", int(known.iloc[0])))
+        return values, explanations
+    
+    def _parse_response(self, response: Any, missing_cols: List[str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Extract the inferred values and explanations from an LLM response.
+        
+        Returns:
+            Tuple with the inferred values and their explanations
+        """
+        # Corrigindo a forma de acessar a resposta do LLM
+        # A resposta agora é um dicionário com vários campos
+        if hasattr(response, 'text'):
+            # Formato antigo (para compatibilidade)
+            response_text = response.text
+        elif isinstance(response, dict) and 'text' in response:
+            # Algumas versões retornam um dicionário com a chave 'text'
+            response_text = response['text']
+        elif isinstance(response, dict) and 'content' in response:
+            # Outras versões retornam um dicionário com a chave 'content'
+            response_text = response['content']
+        else:
+            # Se for uma string direta ou outro formato
+            response_text = str(response)
+        
+        # Extrair o JSON da resposta (pode estar em vários formatos)
+        try:
+            # Tentar avaliar como expressão Python
+            response_data = eval(response_text)
+        except:
+            # Tentar analisar como JSON
             try:
-                # Call LLM to infer missing values
-                response = self.chain.invoke(inference_data)
-                
-                # Corrigindo a forma de acessar a resposta do LLM
-                # A resposta agora é um dicionário com vários campos
-                if hasattr(response, 'text'):
-                    # Formato antigo (para compatibilidade)
-                    response_text = response.text
-                elif isinstance(response, dict) and 'text' in response:
-                    # Algumas versões retornam um dicionário com a chave 'text'
-                    response_text = response['text']
-                elif isinstance(response, dict) and 'content' in response:
-                    # Outras versões retornam um dicionário com a chave 'content'
-                    response_text = response['content']
+                response_data = json.loads(response_text)
+            except:
+                # Último recurso: extrair apenas a parte JSON da resposta
+                import re
+                json_pattern = r'\{.*\}'
+                match = re.search(json_pattern, response_text, re.DOTALL)
+                if match:
+                    response_data = json.loads(match.group(0))
                 else:
-                    # Se for uma string direta ou outro formato
-                    response_text = str(response)
-                
-                # Extrair o JSON da resposta (pode estar em vários formatos)
-                try:
-                    # Tentar avaliar como expressão Python
-                    response_data = eval(response_text)
-                except:
-                    # Tentar analisar como JSON
-                    try:
-                        response_data = json.loads(response_text)
-                    except:
-                        # Último recurso: extrair apenas a parte JSON da resposta
-                        import re
-                        json_pattern = r'\{.*\}'
-                        match = re.search(json_pattern, response_text, re.DOTALL)
-                        if match:
-                            response_data = json.loads(match.group(0))
-                        else:
-                            raise ValueError(f"Couldn't extract JSON from response: {response_text}")
-                
-                # Inicializar dicionários para valores e explicações
-                inferred_values = {}
-                explanations = {}
-                
-                # Processar a resposta
-                for key, value in response_data.items():
-                    if key.startswith("explicacao_"):
-                        # Extrair o nome da coluna da explicação (remover o prefixo "explicacao_")
-                        col_name = key[11:]
-                        explanations[col_name] = value
-                    elif key != "explicacoes" and key != "valores" and key in missing_cols:
-                        # Se não for uma chave de metadados e for uma coluna ausente
-                        inferred_values[key] = value
-                
-                # Se temos o formato antigo com valores e explicações separados
-                if "valores" in response_data and isinstance(response_data["valores"], dict):
-                    for col, value in response_data["valores"].items():
-                        inferred_values[col] = value
-                
-                if "explicacoes" in response_data and isinstance(response_data["explicacoes"], dict):
-                    for col, expl in response_data["explicacoes"].items():
-                        explanations[col] = expl
-                
-                # Update the result dataframe with inferred values
-                for col, value in inferred_values.items():
-                    result_df.at[idx, col] = value
-                
-                # Compilar todas as explicações em uma única string
-                explanation_text = []
-                for col in missing_cols:
-                    if col in explanations:
-                        explanation_text.append(f"{col}: {explanations[col]}")
-                    elif col in inferred_values:
-                        explanation_text.append(f"{col}: Valor inferido sem explicação detalhada")
-                
-                # Adicionar explicação à coluna de explicações
-                result_df.at[idx, 'explicacoes_inferencia'] = " | ".join(explanation_text)
-                    
-            except Exception as e:
-                print(f"Error processing row {idx}: {e}")
-                
-        return result_df 
\ No newline at end of file
+                    raise ValueError(f"Couldn't extract JSON from response: {response_text}")
+        
+        # Inicializar dicionários para valores e explicações
+        inferred_values = {}
+        explanations = {}
+        
+        # Processar a resposta
+        for key, value in response_data.items():
+            if key.startswith("explicacao_"):
+                # Extrair o nome da coluna da explicação (remover o prefixo "explicacao_")
+                col_name = key[11:]
+                explanations[col_name] = value
+            elif key != "explicacoes" and key != "valores" and key in missing_cols:
+                # Se não for uma chave de metadados e for uma coluna ausente
+                inferred_values[key] = value
+        
+        # Se temos o formato antigo com valores e explicações separados
+        if "valores" in response_data and isinstance(response_data["valores"], dict):
+            for col, value in response_data["valores"].items():
+                inferred_values[col] = value
+        
+        if "explicacoes" in response_data and isinstance(response_data["explicacoes"], dict):
+            for col, expl in response_data["explicacoes"].items():
+                explanations[col] = expl
+        
+        return inferred_values, explanations
+    
+    def _validate_batch(self,
+                        pending: Dict[Any, Tuple[Dict[str, Any], Dict[str, str]]],
+                        result_df: pd.DataFrame,
+                        validator: Optional[ValidationEngine],
+                        write_buffer: ColumnarWriteBuffer,
+                        explanation_store: Optional[ExplanationStore],
+                        rejection_history: Dict[Tuple[Any, str], List[str]]) -> List[Tuple[Any, List[str], str]]:
+        """
+        Validate a batch of inferences and queue the accepted cells for write-back.
+        
+        Rejected values are appended to rejection_history, so the feedback of each
+        re-inference round lists every value rejected for the cell so far.
+        
+        Returns:
+            Re-inference queue entries (row index, rejected columns, feedback for the LLM)
+        """
+        if not pending:
+            return []
+        
+        reasons = None
+        if validator is not None:
+            # Linhas candidatas: valores atuais combinados com os valores inferidos
+            candidates = result_df.loc[list(pending)].copy()
+            candidate_buffer = ColumnarWriteBuffer()
+            for idx, (inferred_values, _) in pending.items():
+                candidate_buffer.add_row(idx, inferred_values)
+            candidate_buffer.flush(candidates)
+            # Apenas as células inferidas são validadas; os valores originais servem de contexto
+            inferred = pd.DataFrame(False, index=candidates.index, columns=candidates.columns)
+            for idx, (inferred_values, _) in pending.items():
+                inferred.loc[idx, [col for col in inferred_values if col in inferred.columns]] = True
+            reasons = validator.validate(candidates, inferred)
+        
+        rejected = []
+        for idx, (inferred_values, explanations) in pending.items():
+            accepted = {}
+            rejected_cols = []
+            for col, value in inferred_values.items():
+                reason = reasons.at[idx, col] if reasons is not None else None
+                if pd.isna(reason):
+                    accepted[col] = value
+                else:
+                    rejected_cols.append(col)
+                    rejection_history.setdefault((idx, col), []).append(
+                        f"- {col}: o valor '{value}' foi rejeitado ({reason})")
+            
+            # Queue the accepted values for the columnar write-back
+            write_buffer.add_row(idx, accepted)
+            
+            # Registrar as explicações como códigos internados (coluna=ID)
+            if explanation_store is not None and accepted:
+                for col in accepted:
+                    explanation = explanations.get(col, NO_DETAIL_EXPLANATION)
+                    # Explicações de modelo chegam como (texto, parâmetros)
+                    text, params = explanation if isinstance(explanation, tuple) else (explanation, ())
+                    code = explanation_store.add(idx, col, text, params)
+                write_buffer.add(idx, EXPLANATION_COLUMN, code)
+            
+            if rejected_cols:
+                feedback = [line for col in rejected_cols for line in rejection_history[(idx, col)]]
+                feedback_text = ("Os valores abaixo foram rejeitados pela validação em tentativas anteriores "
+                                 "e não devem ser repetidos:\n" + "\n".join(feedback))
+                rejected.append((idx, rejected_cols, feedback_text))
+        
+        return rejected
+    
+    def _flush_writes(self,
+                      write_buffer: ColumnarWriteBuffer,
+                      result_df: pd.DataFrame,
+                      patch_path: Optional[str],
+                      patch_started: bool,
+                      patch_renderer: Optional[ExplanationStore] = None) -> bool:
+        """
+        Apply the buffered inferences to result_df and append them to the patch file.
+        
+        Args:
+            patch_renderer: If given, explanation codes are written to the patch as full text
+        
+        Returns:
+            Whether the patch file has already been started
+        """
+        if len(write_buffer) == 0:
+            return patch_started
+        
+        patch_df = write_buffer.flush(result_df)
+        if patch_path:
+            if patch_renderer is not None:
+                is_explanation = patch_df["column"] == EXPLANATION_COLUMN
+                patch_df.loc[is_explanation, "value"] = patch_renderer.render_series(
+                    patch_df.loc[is_explanation, "value"])
+            write_patch(patch_df, patch_path, append=patch_started)
+            return True
+        return patch_started
@@ -2,7 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from utils import load_csv, find_missing_data
+from utils import load_csv, find_missing_data, find_missing_patterns
 
 def analyze_missing_data(file_path):
     """Analyze missing data patterns in a CSV file."""
@@ -27,10 +27,7 @@ def analyze_missing_data(file_path):
     
     # Analyze patterns of missing data
     print("\nMissing data patterns (first 10):")
-    missing_patterns = {}
-    for idx, missing_cols in missing_data_map.items():
-        pattern = tuple(sorted(missing_cols))
-        missing_patterns[pattern] = missing_patterns.get(pattern, 0) + 1
+    missing_patterns = find_missing_patterns(missing_data_map)
     
     for i, (pattern, count) in enumerate(sorted(missing_patterns.items(), key=lambda x: x[1], reverse=True)):
         if i >= 10:
@@ -0,0 +1,160 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Pesos oficiais dos dígitos verificadores do CNPJ
+FIRST_DIGIT_WEIGHTS = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+SECOND_DIGIT_WEIGHTS = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def normalize_cnpj(values: pd.Series) -> pd.Series:
+    """
+    Normalize CNPJ values to 14-digit strings.
+
+    Accepts formatted (XX.XXX.XXX/XXXX-XX), unformatted, numeric and
+    non-zero-padded values.
+
+    Args:
+        values: Series with raw consignee_code values
+
+    Returns:
+        Series of 14-digit strings, with NaN where the value cannot be a CNPJ
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.astype("Int64")
+
+    text = values.astype(object).where(values.notna())
+    digits = (text.dropna().astype(str)
+              .str.replace(r"\.0+$", "", regex=True)
+              .str.replace(r"\D", "", regex=True))
+    digits = digits[(digits.str.len() > 0) & (digits.str.len() <= 14)].str.zfill(14)
+
+    return digits.reindex(values.index)
+
+
+def _check_digits(digits: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Compute one CNPJ check digit for each row of a digit matrix."""
+    remainder = (digits[:, :len(weights)] * weights).sum(axis=1) % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def is_valid_cnpj(values: pd.Series) -> pd.Series:
+    """
+    Vectorized CNPJ checksum verification.
+
+    Args:
+        values: Series with raw consignee_code values
+
+    Returns:
+        Boolean Series, True where the value is a CNPJ with valid check digits
+    """
+    normalized = normalize_cnpj(values).dropna()
+    valid = pd.Series(False, index=values.index)
+    if normalized.empty:
+        return valid
+
+    digits = (np.frombuffer("".join(normalized).encode("ascii"), dtype=np.uint8)
+              .reshape(-1, 14).astype(np.int64) - ord("0"))
+
+    first_ok = _check_digits(digits, FIRST_DIGIT_WEIGHTS) == digits[:, 12]
+    second_ok = _check_digits(digits, SECOND_DIGIT_WEIGHTS) == digits[:, 13]
+    # Sequências repetidas (00000000000000, 11111111111111, ...) passam no
+    # cálculo mas não são CNPJs válidos
+    not_repeated = (digits != digits[:, :1]).any(axis=1)
+
+    valid.loc[normalized.index] = first_ok & second_ok & not_repeated
+    return valid
+
+
+def cnpj_keys(values: pd.Series) -> pd.Series:
+    """
+    Convert CNPJ values to compact integer keys (the 14 digits as an int64).
+
+    Args:
+        values: Series with raw consignee_code values
+
+    Returns:
+        Series with nullable Int64 keys, missing where the value cannot be a CNPJ
+    """
+    return pd.to_numeric(normalize_cnpj(values), errors="coerce").astype("Int64")
+
+
+def cnpj_roots(keys: pd.Series) -> pd.Series:
+    """
+    Extract the CNPJ root (first 8 digits, identifying the company) from integer keys.
+
+    Args:
+        keys: Series with Int64 keys produced by cnpj_keys
+
+    Returns:
+        Series with nullable Int64 roots
+    """
+    # Os 6 últimos dígitos são a filial (4) e os dígitos verificadores (2)
+    return keys // 1_000_000
+
+
+class ConsigneeIndex:
+    """
+    Exact-lookup index over the consignees of the reference data.
+
+    Stores one normalized integer key per reference row and, for each CNPJ
+    root, the shippers, NCMs and clearance places the company is known for.
+    """
+
+    PROFILE_COLUMNS = ["shipper_name", "ncm_code", "clearance_place_entry"]
+
+    def __init__(self, reference_df: pd.DataFrame):
+        if "consignee_code" in reference_df.columns:
+            self.keys = cnpj_keys(reference_df["consignee_code"])
+        else:
+            self.keys = pd.Series(pd.NA, index=reference_df.index, dtype="Int64")
+        self.roots = cnpj_roots(self.keys)
+
+        # Posições das linhas de referência por raiz do CNPJ (calculadas pelo groupby)
+        self._known_roots = self.roots.dropna()
+        self._root_positions: Dict[int, np.ndarray] = {
+            int(root): positions
+            for root, positions in self._known_roots.groupby(self._known_roots).indices.items()
+        }
+
+        # Perfil de cada raiz: contagem de (raiz, valor), com índice ordenado para busca por raiz
+        self.profile_counts: Dict[str, pd.Series] = {}
+        for col in self.PROFILE_COLUMNS:
+            if col not in reference_df.columns:
+                continue
+            pairs = pd.DataFrame({"root": self.roots, "value": reference_df[col]}).dropna()
+            counts = pairs.groupby(["root", "value"]).size().sort_index()
+            self.profile_counts[col] = counts
+
+    def key_for(self, value: Any) -> Optional[int]:
+        """Return the integer key for a single consignee_code value, or None."""
+        key = cnpj_keys(pd.Series([value])).iloc[0]
+        return None if pd.isna(key) else int(key)
+
+    def root_for(self, value: Any) -> Optional[int]:
+        """Return the CNPJ root for a single consignee_code value, or None."""
+        key = self.key_for(value)
+        return None if key is None else key // 1_000_000
+
+    def rows_for_root(self, root: Optional[int]) -> pd.Index:
+        """Return the reference index labels of all rows sharing the CNPJ root."""
+        positions = self._root_positions.get(root) if root is not None else None
+        if positions is None:
+            return pd.Index([])
+        return self._known_roots.index[positions]
+
+    def known_values(self, root: Optional[int], col: str) -> pd.Series:
+        """
+        Return the values observed for a column with the CNPJ root.
+
+        Returns:
+            Series of occurrence counts indexed by value, most frequent first
+        """
+        counts = self.profile_counts.get(col)
+        if root is None or counts is None:
+            return pd.Series(dtype=int)
+        try:
+            return counts.xs(root, level="root").sort_values(ascending=False)
+        except KeyError:
+            return pd.Series(dtype=int)
@@ -0,0 +1,307 @@
+import os
+import time
+import itertools
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from utils import load_csv, find_missing_data, find_missing_patterns
+from cnpj import cnpj_keys, ConsigneeIndex
+from agent import DataCompletionAgent
+from prompt_engineering import ExampleBank
+
+# Parâmetros que podem variar na grade de avaliação e seus valores padrão
+DEFAULT_PARAMS = {
+    "model": "gpt-3.5-turbo",
+    "max_similar_rows": 5,
+    "batch_size": 10,
+    "validate": True,
+    "max_reinference_attempts": 1,
+    "fast_fill": True,
+    "fast_fill_min_support": 3,
+    "example_token_budget": 0,
+    "request_deadline": 60.0,
+    "max_hedges": 1,
+    "breaker_threshold": 0.5,
+    "breaker_cooldown": 30.0
+}
+
+MATCH_COLUMNS = ["ncm_code", "country_origin_acronym", "transport_mode_pt",
+                 "clearance_place_entry", "consignee_code", "shipper_name"]
+
+
+def build_holdout(reference_df: pd.DataFrame,
+                  missing_patterns: Dict[Tuple[str, ...], int],
+                  sample_size: int = 100,
+                  seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Mask complete reference rows following the empirical missing-data patterns.
+
+    Args:
+        reference_df: Reference DataFrame with complete data
+        missing_patterns: Pattern counts from find_missing_patterns (on the target file)
+        sample_size: Number of complete rows to hold out
+        seed: Random seed for sampling rows and patterns
+
+    Returns:
+        Tuple with the masked rows, their ground truth, and the remaining
+        reference rows (without the held-out ones, to avoid leakage)
+    """
+    patterns = [p for p in missing_patterns if all(col in reference_df.columns for col in p)]
+    if not patterns:
+        raise ValueError("None of the missing-data patterns apply to the reference columns")
+    weights = np.array([missing_patterns[p] for p in patterns], dtype=float)
+    weights /= weights.sum()
+
+    complete = reference_df.dropna()
+    holdout = complete.sample(n=min(sample_size, len(complete)), random_state=seed)
+    remaining_reference = reference_df.drop(index=holdout.index)
+
+    truth_df = holdout.reset_index(drop=True)
+    masked_df = truth_df.copy()
+
+    # Um padrão por linha, sorteado com a frequência observada no arquivo alvo
+    rng = np.random.default_rng(seed)
+    assigned = rng.choice(len(patterns), size=len(masked_df), p=weights)
+    for pattern_id in np.unique(assigned):
+        masked_df.loc[assigned == pattern_id, list(patterns[pattern_id])] = np.nan
+
+    return masked_df, truth_df, remaining_reference
+
+
+def _comparable(col: str, values: pd.Series) -> pd.Series:
+    """Normalize values so that predictions and ground truth compare equal."""
+    if col == "consignee_code":
+        return cnpj_keys(values).astype(object)
+    text = values.astype(str).str.strip().str.upper().str.replace(r"\.0+$", "", regex=True)
+    return text.where(values.notna())
+
+
+def score_predictions(masked_df: pd.DataFrame,
+                      truth_df: pd.DataFrame,
+                      completed_df: pd.DataFrame) -> Dict[str, float]:
+    """
+    Compute per-column accuracy over the masked cells.
+
+    Returns:
+        Dictionary with accuracy_<col> for each masked column, plus overall
+        accuracy and coverage (fraction of masked cells that were filled)
+    """
+    metrics = {}
+    correct_total = 0
+    filled_total = 0
+    masked_total = 0
+
+    for col in truth_df.columns:
+        masked = masked_df[col].isna() & truth_df[col].notna()
+        if not masked.any():
+            continue
+        predicted = _comparable(col, completed_df.loc[masked, col])
+        expected = _comparable(col, truth_df.loc[masked, col])
+        correct = (predicted == expected).fillna(False).astype(bool)
+
+        metrics[f"accuracy_{col}"] = correct.mean()
+        correct_total += int(correct.sum())
+        filled_total += int(predicted.notna().sum())
+        masked_total += int(masked.sum())
+
+    metrics["accuracy"] = correct_total / masked_total if masked_total else float("nan")
+    metrics["coverage"] = filled_total / masked_total if masked_total else float("nan")
+    return metrics
+
+
+def run_configuration(params: Dict[str, Any],
+                      masked_df: pd.DataFrame,
+                      truth_df: pd.DataFrame,
+                      reference_df: pd.DataFrame,
+                      example_bank: Optional[ExampleBank] = None,
+                      consignee_index: Optional[ConsigneeIndex] = None) -> Dict[str, Any]:
+    """
+    Run the full DataCompletionAgent pipeline on the holdout with one configuration.
+
+    Returns:
+        Dictionary with the parameters, accuracy metrics and cost metrics
+    """
+    # Orçamento zero desativa os exemplos few-shot
+    agent = DataCompletionAgent(model_name=params["model"],
+                                example_bank=example_bank if params["example_token_budget"] > 0 else None,
+                                example_token_budget=params["example_token_budget"],
+                                request_deadline=params["request_deadline"],
+                                max_hedges=params["max_hedges"],
+                                breaker_threshold=params["breaker_threshold"],
+                                breaker_cooldown=params["breaker_cooldown"])
+
+    start = time.perf_counter()
+    try:
+        completed_df = agent.process_dataframe(
+            masked_df,
+            reference_df,
+            MATCH_COLUMNS,
+            batch_size=params["batch_size"],
+            max_similar_rows=params["max_similar_rows"],
+            validate=params["validate"],
+            max_reinference_attempts=params["max_reinference_attempts"],
+            fast_fill=params["fast_fill"],
+            fast_fill_min_support=params["fast_fill_min_support"],
+            consignee_index=consignee_index
+        )
+    finally:
+        # Cada configuração cria seu próprio agente (e pool de threads)
+        agent.close()
+    wall_time = time.perf_counter() - start
+
+    result = dict(params)
+    result.update(score_predictions(masked_df, truth_df, completed_df))
+    result.update({
+        "calls": agent.usage.calls,
+        "prompt_tokens": agent.usage.prompt_tokens,
+        "completion_tokens": agent.usage.completion_tokens,
+        "total_tokens": agent.usage.total_tokens,
+        "wall_time_s": wall_time,
+        "rows_per_s": len(masked_df) / wall_time if wall_time > 0 else float("nan")
+    })
+    latency = agent.invoker.stats()
+    result.update({
+        "latency_p99_s": latency.get("p99", float("nan")),
+        "latency_max_s": latency.get("max", float("nan")),
+        "hedges": latency["hedges"],
+        "timeouts": latency["timeouts"]
+    })
+    return result
+
+
+def pareto_frontier(results_df: pd.DataFrame,
+                    cost_column: str = "total_tokens",
+                    accuracy_column: str = "accuracy") -> pd.Series:
+    """
+    Flag the configurations that no other configuration beats on both cost and accuracy.
+
+    Returns:
+        Boolean Series aligned with results_df
+    """
+    ordered = results_df.sort_values([cost_column, accuracy_column], ascending=[True, False])
+    on_frontier = pd.Series(False, index=results_df.index)
+    best_accuracy = -np.inf
+    for idx, accuracy in ordered[accuracy_column].items():
+        if accuracy > best_accuracy:
+            on_frontier[idx] = True
+            best_accuracy = accuracy
+    return on_frontier
+
+
+def _parse_value(value: str) -> Any:
+    """Convert a grid value from the command line to int/float/bool when possible."""
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_grid(grid_args: List[str]) -> List[Dict[str, Any]]:
+    """
+    Expand --grid arguments (name=v1,v2,...) into the list of configurations to run.
+    """
+    axes = {}
+    for arg in grid_args or []:
+        name, _, values = arg.partition("=")
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown grid parameter: {name}. Options: {', '.join(DEFAULT_PARAMS)}")
+        axes[name] = [_parse_value(v) for v in values.split(",") if v]
+
+    names = list(axes)
+    configurations = []
+    for combination in itertools.product(*(axes[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, combination))
+        configurations.append(params)
+    return configurations
+
+
+def main():
+    # Load environment variables
+    load_dotenv()
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Evaluate accuracy vs cost of the data completion agent on a masked holdout')
+    parser.add_argument('--target', type=str, default='duimp_202502.csv', help='Path to the target CSV file (source of the missing-data patterns)')
+    parser.add_argument('--reference', type=str, default='duimp_completa__202412.csv', help='Path to the reference CSV file')
+    parser.add_argument('--output', type=str, default='evaluation_results.csv', help='Path to save the evaluation results')
+    parser.add_argument('--sample-size', type=int, default=100, help='Number of complete reference rows to mask')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the holdout')
+    parser.add_argument('--grid', type=str, action='append', help='Parameter grid axis as name=v1,v2 (repeatable). Options: ' + ', '.join(DEFAULT_PARAMS))
+    parser.add_argument('--target-accuracy', type=float, default=None, help='Report the cheapest configuration meeting this overall accuracy')
+
+    args = parser.parse_args()
+
+    # Check if files exist
+    if not os.path.exists(args.target):
+        raise FileNotFoundError(f"Target file not found: {args.target}")
+
+    if not os.path.exists(args.reference):
+        raise FileNotFoundError(f"Reference file not found: {args.reference}")
+
+    # Check for OpenAI API key
+    if not os.getenv("OPENAI_API_KEY"):
+        raise EnvironmentError("OPENAI_API_KEY environment variable not set. Please set it in a .env file.")
+
+    print(f"Loading target file: {args.target}")
+    target_df = load_csv(args.target)
+
+    print(f"Loading reference file: {args.reference}")
+    reference_df = load_csv(args.reference)
+
+    missing_patterns = find_missing_patterns(find_missing_data(target_df))
+    masked_df, truth_df, remaining_reference = build_holdout(reference_df, missing_patterns,
+                                                             args.sample_size, args.seed)
+    print(f"Holdout: {len(masked_df)} rows masked with {len(missing_patterns)} missing-data patterns")
+
+    configurations = parse_grid(args.grid)
+    
+    # Índice de CNPJs construído uma única vez e compartilhado entre as configurações
+    consignee_index = ConsigneeIndex(remaining_reference)
+    
+    # Banco de exemplos construído sem as linhas do holdout
+    example_bank = None
+    if any(params["example_token_budget"] > 0 for params in configurations):
+        example_bank = ExampleBank.from_reference(remaining_reference)
+    
+    results = []
+    for i, params in enumerate(configurations):
+        print(f"\nConfiguration {i + 1}/{len(configurations)}: {params}")
+        result = run_configuration(params, masked_df, truth_df, remaining_reference, example_bank,
+                                   consignee_index)
+        print(f"Accuracy: {result['accuracy']:.2%} | Coverage: {result['coverage']:.2%} | "
+              f"Tokens: {result['total_tokens']} | Calls: {result['calls']} | "
+              f"Time: {result['wall_time_s']:.1f}s ({result['rows_per_s']:.2f} rows/s) | "
+              f"Latency p99/max: {result['latency_p99_s']:.2f}s/{result['latency_max_s']:.2f}s")
+        results.append(result)
+
+    results_df = pd.DataFrame(results)
+    results_df["pareto"] = pareto_frontier(results_df)
+
+    print("\nPareto frontier (tokens vs accuracy):")
+    frontier = results_df[results_df["pareto"]].sort_values("total_tokens")
+    print(frontier[list(DEFAULT_PARAMS) + ["accuracy", "total_tokens", "calls", "rows_per_s"]].to_string(index=False))
+
+    if args.target_accuracy is not None:
+        eligible = frontier[frontier["accuracy"] >= args.target_accuracy]
+        if len(eligible) > 0:
+            print(f"\nCheapest configuration with accuracy >= {args.target_accuracy:.2%}:")
+            print(eligible.iloc[0][list(DEFAULT_PARAMS)].to_dict())
+        else:
+            print(f"\nNo configuration reached accuracy >= {args.target_accuracy:.2%}")
+
+    print(f"\nSaving evaluation results to {args.output}")
+    results_df.to_csv(args.output, index=False)
+
+    print("Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+# Níveis de detalhe da coluna de explicações
+VERBOSITY_LEVELS = ["none", "short", "full"]
+
+EXPLANATION_COLUMN = "explicacoes_inferencia"
+
+NO_DETAIL_EXPLANATION = "Valor inferido sem explicação detalhada"
+
+
+class ExplanationStore:
+    """
+    Interned storage for inference explanations.
+
+    Each distinct explanation text is stored once in a side table and referenced
+    by an integer ID. Rows carry compact codes such as "transport_mode_pt=3;consignee_code=7",
+    and the full text is only rendered on demand.
+
+    Explanations that vary only in a few values are stored once as a template
+    ("... raiz do CNPJ {0} ...") and the values travel in the code as parameters
+    ("shipper_name=2:11222333,5"), filled in at render time.
+    """
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._row_codes: Dict[Any, Dict[str, Tuple[int, Tuple[str, ...]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def intern(self, text: str) -> int:
+        """Return the ID of an explanation text, adding it to the side table if new."""
+        text = str(text).strip()
+        explanation_id = self._ids.get(text)
+        if explanation_id is None:
+            explanation_id = len(self.texts)
+            self._ids[text] = explanation_id
+            self.texts.append(text)
+        return explanation_id
+
+    def add(self, idx: Any, col: str, text: str, params: Sequence[Any] = ()) -> str:
+        """
+        Record the explanation of one inferred cell.
+
+        Args:
+            idx: Row index
+            col: Explained column
+            text: Explanation text, or a template with {0}, {1}, ... placeholders
+            params: Values for the template placeholders (kept in the row code)
+
+        Returns:
+            The updated compact code for the row
+        """
+        params = tuple(str(param) for param in params)
+        if any(sep in param for param in params for sep in ";:,"):
+            raise ValueError(f"Explanation parameters cannot contain ';', ':' or ',': {params}")
+        self._row_codes.setdefault(idx, {})[col] = (self.intern(text), params)
+        return self.code_for(idx)
+
+    def code_for(self, idx: Any) -> str:
+        """Return the compact code with every explained column of a row."""
+        items = []
+        for col, (explanation_id, params) in self._row_codes.get(idx, {}).items():
+            items.append(f"{col}={explanation_id}:{','.join(params)}" if params else f"{col}={explanation_id}")
+        return ";".join(items)
+
+    def render(self, code: str) -> str:
+        """Render a compact code as the full explanation text."""
+        if not code:
+            return ""
+        parts = []
+        for item in code.split(";"):
+            col, _, reference = item.partition("=")
+            explanation_id, _, params = reference.partition(":")
+            text = self.texts[int(explanation_id)]
+            if params:
+                text = text.format(*params.split(","))
+            parts.append(f"{col}: {text}")
+        return " | ".join(parts)
+
+    def render_series(self, codes: pd.Series) -> pd.Series:
+        """Render a Series of compact codes, rendering each distinct code only once."""
+        rendered = {code: self.render(code) for code in codes.dropna().unique()}
+        return codes.map(rendered)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the side table (explanation ID and text)."""
+        return pd.DataFrame({"id": range(len(self.texts)), "text": self.texts})
+
+    def save(self, path: str) -> None:
+        """Save the side table as CSV."""
+        self.to_frame().to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path: str) -> "ExplanationStore":
+        """Load a side table saved with save(), to render codes from a previous run."""
+        store = cls()
+        for text in pd.read_csv(path, keep_default_na=False).sort_values("id")["text"]:
+            store.intern(text)
+        return store
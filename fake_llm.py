@@ -0,0 +1,94 @@
+import json
+import time
+import random
+import argparse
+import threading
+from typing import Any, Dict
+
+from resilience import HedgedInvoker, CircuitBreaker, format_latency_stats
+
+
+class StallingFakeChain:
+    """
+    Local stand-in for the LLM chain that injects random stalls and errors.
+
+    Answers like the real chain ({"text": <json>}), filling each missing column
+    with the value of the first similar row, so it can replace agent.chain.
+
+    Args:
+        base_latency: Median latency of a normal call (seconds)
+        stall_probability: Probability that a call stalls
+        stall_seconds: Duration of a stalled call
+        error_probability: Probability that a call raises an error
+        seed: Random seed
+    """
+
+    def __init__(self, base_latency: float = 0.05, stall_probability: float = 0.05,
+                 stall_seconds: float = 5.0, error_probability: float = 0.0, seed: int = 42):
+        self.base_latency = base_latency
+        self.stall_probability = stall_probability
+        self.stall_seconds = stall_seconds
+        self.error_probability = error_probability
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        with self._lock:
+            latency = self.base_latency * self._random.lognormvariate(0, 0.3)
+            stalled = self._random.random() < self.stall_probability
+            failed = self._random.random() < self.error_probability
+
+        time.sleep(self.stall_seconds if stalled else latency)
+        if failed:
+            raise RuntimeError("Fake LLM error")
+
+        similar_rows = inputs.get("similar_rows") or [{}]
+        response = {}
+        for col in inputs.get("missing_columns", []):
+            response[col] = similar_rows[0].get(col)
+            response[f"explicacao_{col}"] = "Valor copiado do primeiro registro semelhante (LLM simulado)"
+        return {"text": json.dumps(response, ensure_ascii=False, default=str)}
+
+
+def run_benchmark(invoker: HedgedInvoker, calls: int) -> float:
+    """Run sequential calls through the invoker and return the total wall time."""
+    inputs = {"missing_columns": ["transport_mode_pt"], "similar_rows": [{"transport_mode_pt": "MARITIMA"}]}
+    start = time.perf_counter()
+    for _ in range(calls):
+        try:
+            invoker.invoke(inputs)
+        except Exception:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare tail latency with and without hedged requests using a fake LLM with random stalls')
+    parser.add_argument('--calls', type=int, default=200, help='Number of sequential calls')
+    parser.add_argument('--stall-probability', type=float, default=0.05, help='Probability that a fake call stalls')
+    parser.add_argument('--stall-seconds', type=float, default=2.0, help='Duration of a stalled fake call')
+    parser.add_argument('--error-probability', type=float, default=0.0, help='Probability that a fake call fails')
+    parser.add_argument('--deadline', type=float, default=1.0, help='Per-request deadline in seconds')
+    parser.add_argument('--hedge-percentile', type=float, default=95.0, help='Latency percentile that triggers a hedged request')
+
+    args = parser.parse_args()
+
+    modes = [
+        ("no deadline", None, 0),
+        ("deadline only", args.deadline, 0),
+        ("deadline + hedging", args.deadline, 1)
+    ]
+    for label, deadline, max_hedges in modes:
+        chain = StallingFakeChain(stall_probability=args.stall_probability, stall_seconds=args.stall_seconds,
+                                  error_probability=args.error_probability)
+        invoker = HedgedInvoker(chain.invoke, deadline=deadline, hedge_percentile=args.hedge_percentile,
+                                max_hedges=max_hedges, breaker=CircuitBreaker(cooldown=1.0))
+        wall_time = run_benchmark(invoker, args.calls)
+        invoker.shutdown()
+
+        print(f"\n{label}: {wall_time:.1f}s total")
+        print(format_latency_stats(invoker.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,130 +1,207 @@
-import pandas as pd
+import os
 import json
-from typing import List, Dict, Any
+import argparse
+from typing import List, Dict, Any, Tuple
+
+import pandas as pd
+
+from utils import load_csv
+
+# Chave usada quando o NCM do registro é desconhecido ou o capítulo não tem exemplos
+ANY_CHAPTER = "*"
 
-from utils import load_csv, find_missing_data, find_similar_rows
+def ncm_chapter(ncm_code: Any) -> str:
+    """Return the NCM chapter (first 2 of the 8 digits) of a single code, or ANY_CHAPTER."""
+    if ncm_code is None or pd.isna(ncm_code):
+        return ANY_CHAPTER
+    if isinstance(ncm_code, float):
+        ncm_code = int(ncm_code)
+    digits = "".join(ch for ch in str(ncm_code) if ch.isdigit())
+    return digits.zfill(8)[:2] if digits else ANY_CHAPTER
 
-def generate_prompt_examples(target_file: str, reference_file: str, num_examples: int = 5) -> List[Dict[str, Any]]:
+def ncm_chapters(ncm_codes: pd.Series) -> pd.Series:
     """
-    Generate examples for prompt engineering by finding rows with missing data
-    and creating examples of how the LLM should complete them.
-    
+    Extract the NCM chapter (first 2 of the 8 digits) from NCM codes.
+
     Args:
-        target_file: Path to the CSV file with missing data
-        reference_file: Path to the reference CSV file with complete data
-        num_examples: Number of examples to generate
-        
+        ncm_codes: Series with ncm_code values (numeric or text)
+
     Returns:
-        List of example dictionaries for prompt engineering
+        Series with 2-digit chapter strings, with ANY_CHAPTER where the code is missing
     """
-    # Load CSV files
-    target_df = load_csv(target_file)
-    reference_df = load_csv(reference_file)
-    
-    # Find rows with missing data
-    missing_data_map = find_missing_data(target_df)
-    
-    # Columns typically used for matching
-    match_columns = ["yearmonth", "ncm_code", "country_origin_acronym", "shipper_name"]
-    
-    examples = []
-    count = 0
-    
-    for idx, missing_cols in missing_data_map.items():
-        if count >= num_examples:
-            break
-            
-        row = target_df.iloc[idx]
-        
-        # Find similar rows in the reference dataset
-        similar_rows = find_similar_rows(row, reference_df, match_columns)
-        
-        if len(similar_rows) == 0:
-            continue
-            
-        # Get the first similar row as an example of "correct" data
-        example_row = similar_rows.iloc[0]
-        
-        # Create the example
-        example = {
-            "input": {
-                "row_data": row.to_dict(),
-                "missing_columns": missing_cols,
-                "similar_rows": similar_rows.head(3).to_dict('records')
-            },
-            "expected_output": {
-                col: example_row[col] for col in missing_cols if col in example_row
-            }
-        }
-        
-        examples.append(example)
-        count += 1
-    
-    return examples
-
-def create_few_shot_prompt(examples: List[Dict[str, Any]]) -> str:
+    text = ncm_codes.astype(str).str.replace(r"\.0+$", "", regex=True).str.replace(r"\D", "", regex=True)
+    chapters = text.str.zfill(8).str[:2]
+    return chapters.where(ncm_codes.notna() & (text.str.len() > 0), ANY_CHAPTER)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+# Campos que determinam o valor de cada coluna, citados nas explicações dos exemplos
+DETERMINING_COLUMNS = {
+    "transport_mode_pt": ["clearance_place_entry", "country_origin_acronym"],
+    "clearance_place_entry": ["transport_mode_pt", "consignee_code"],
+    "consignee_code": ["shipper_name", "ncm_code"],
+    "shipper_name": ["consignee_code", "ncm_code"],
+    "country_origin_acronym": ["shipper_name", "consignee_code"],
+    "ncm_code": ["shipper_name", "consignee_code"]
+}
+
+def example_explanation(col: str, row_data: Dict[str, Any]) -> str:
     """
-    Create a few-shot prompt for LLM training with examples of data completion.
-    
+    Explain an example answer by citing the known fields that determine the column.
+
     Args:
-        examples: List of example dictionaries
-        
+        col: Column being explained
+        row_data: Known values of the example record
+
     Returns:
-        String containing the few-shot prompt
+        Explanation text citing up to two fields and their values
     """
-    prompt = """
-You are an expert data analyst working with import/export data. Your task is to infer missing values in import records.
+    fields = [field for field in DETERMINING_COLUMNS.get(col, []) if field in row_data]
+    if not fields:
+        fields = list(row_data)[:2]
+    cited = " e ".join(f"{field} = {row_data[field]}" for field in fields)
+    return f"Valor usado nos registros de referência com {cited}"
 
-Here are examples of how to analyze and infer missing values:
+def render_example(record: Dict[str, Any], missing_columns: List[str]) -> str:
+    """
+    Render a single few-shot example as prompt text.
 
-"""
+    The answer follows the format required by the inference prompt: the value of
+    each missing column plus an explicacao_<col> entry citing the fields behind it.
+    """
+    row_data = {col: value for col, value in record.items() if col not in missing_columns}
+    expected_output = {}
+    for col in sorted(missing_columns):
+        expected_output[col] = record.get(col)
+        expected_output[f"explicacao_{col}"] = example_explanation(col, row_data)
+    return (
+        f"Registro: {json.dumps(row_data, ensure_ascii=False)}\n"
+        f"Colunas ausentes: {json.dumps(sorted(missing_columns), ensure_ascii=False)}\n"
+        f"Resposta: {json.dumps(expected_output, ensure_ascii=False)}"
+    )
+
+class ExampleBank:
+    """
+    Few-shot examples indexed by NCM chapter.
+
+    Each chapter stores a small sample of complete reference records; the
+    missing-column pattern only decides which columns are masked when an example
+    is rendered. Selecting examples for a row is a dictionary lookup, and the
+    rendered block is cached per chapter, missing columns and token budget.
+    """
 
-    for i, example in enumerate(examples):
-        prompt += f"Example {i+1}:\n"
-        prompt += f"Row with missing data: {json.dumps(example['input']['row_data'], indent=2)}\n\n"
-        prompt += f"Missing columns: {example['input']['missing_columns']}\n\n"
-        prompt += f"Similar rows from historical data:\n{json.dumps(example['input']['similar_rows'], indent=2)}\n\n"
-        prompt += f"Inferred values: {json.dumps(example['expected_output'], indent=2)}\n\n"
-        prompt += "---\n\n"
-    
-    prompt += """
-Now, I need you to infer the missing values for this new row:
+    def __init__(self, examples: Dict[str, List[Dict[str, Any]]]):
+        self.examples = examples
+        self._blocks: Dict[Tuple[str, Tuple[str, ...], int], str] = {}
 
-Row with missing data: {row_data}
+    def __len__(self) -> int:
+        return sum(len(records) for records in self.examples.values())
 
-The missing columns that need to be filled are: {missing_columns}
+    @classmethod
+    def from_reference(cls,
+                       reference_df: pd.DataFrame,
+                       examples_per_chapter: int = 3,
+                       seed: int = 42) -> "ExampleBank":
+        """
+        Build the bank from complete reference rows, sampled per NCM chapter.
 
-Here are similar rows from our historical data that might help:
-{similar_rows}
+        Args:
+            reference_df: Reference DataFrame with complete data
+            examples_per_chapter: Number of examples stored per NCM chapter
+            seed: Random seed for sampling the example rows
 
-Based on the similar rows and patterns in the data, infer the most likely value for each missing column.
-Provide your answer as a valid JSON object with only the missing column names and their inferred values.
-Example format: {"column_name": "inferred_value"}
-"""
+        Returns:
+            ExampleBank with one entry per chapter, plus ANY_CHAPTER
+        """
+        complete = reference_df.dropna()
+        chapters = ncm_chapters(complete["ncm_code"]) if "ncm_code" in complete.columns \
+            else pd.Series(ANY_CHAPTER, index=complete.index)
 
-    return prompt
+        # Amostras por capítulo, além de uma amostra geral para capítulos sem exemplos
+        samples = {ANY_CHAPTER: complete.sample(n=min(examples_per_chapter, len(complete)), random_state=seed)}
+        for chapter, group in complete.groupby(chapters):
+            if chapter != ANY_CHAPTER:
+                samples[chapter] = group.sample(n=min(examples_per_chapter, len(group)), random_state=seed)
+
+        # Conversão via JSON para obter tipos nativos (serializáveis)
+        examples = {chapter: json.loads(sample.to_json(orient="records", force_ascii=False))
+                    for chapter, sample in samples.items()}
+        return cls(examples)
+
+    def save(self, path: str) -> None:
+        """Save the bank as JSON."""
+        with open(path, "w") as f:
+            json.dump({"examples": self.examples}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "ExampleBank":
+        """Load a bank saved with save()."""
+        with open(path) as f:
+            return cls(json.load(f)["examples"])
+
+    def select(self, row: pd.Series, missing_columns: List[str], token_budget: int = 600) -> str:
+        """
+        Select the few-shot examples for a row, within a fixed token budget.
+
+        Args:
+            row: Row with missing data
+            missing_columns: Columns that need to be inferred
+            token_budget: Maximum estimated tokens for the rendered examples
+
+        Returns:
+            Prompt block with the selected examples (empty if none fits)
+        """
+        chapter = ncm_chapter(row["ncm_code"] if "ncm_code" in row.index else None)
+        requested = tuple(sorted(missing_columns))
+
+        cache_key = (chapter, requested, token_budget)
+        if cache_key not in self._blocks:
+            records = self.examples.get(chapter)
+            if records is None:
+                records = self.examples.get(ANY_CHAPTER, [])
+
+            selected = []
+            used = 0
+            for record in records:
+                text = render_example(record, list(requested))
+                tokens = estimate_tokens(text)
+                if used + tokens > token_budget:
+                    break
+                selected.append(text)
+                used += tokens
+            self._blocks[cache_key] = "\n\n".join(selected)
+
+        return self._blocks[cache_key]
+
+def load_or_build_example_bank(path: str, reference_df: pd.DataFrame) -> ExampleBank:
+    """
+    Load the example bank from disk, building and saving it first if it does not exist.
+    """
+    if os.path.exists(path):
+        print(f"Loading example bank: {path}")
+        return ExampleBank.load(path)
+
+    print(f"Building example bank: {path}")
+    bank = ExampleBank.from_reference(reference_df)
+    bank.save(path)
+    return bank
 
 def main():
-    target_file = "duimp_202502.csv"
-    reference_file = "duimp_completa__202412.csv"
-    
-    # Generate examples for prompt engineering
-    examples = generate_prompt_examples(target_file, reference_file)
-    
-    # Create the few-shot prompt
-    prompt = create_few_shot_prompt(examples)
-    
-    # Save the prompt to a file
-    with open("few_shot_prompt.txt", "w") as f:
-        f.write(prompt)
-    
-    print(f"Few-shot prompt saved to few_shot_prompt.txt")
-    
-    # Also save the examples as JSON for later use
-    with open("prompt_examples.json", "w") as f:
-        json.dump(examples, f, indent=2)
-    
-    print(f"Prompt examples saved to prompt_examples.json")
+    parser = argparse.ArgumentParser(description='Build the few-shot example bank indexed by NCM chapter')
+    parser.add_argument('--reference', type=str, default='duimp_completa__202412.csv', help='Path to the reference CSV file')
+    parser.add_argument('--output', type=str, default='example_bank.json', help='Path to save the example bank')
+    parser.add_argument('--examples-per-chapter', type=int, default=3, help='Number of examples per NCM chapter')
+
+    args = parser.parse_args()
+
+    reference_df = load_csv(args.reference)
+
+    bank = ExampleBank.from_reference(reference_df, examples_per_chapter=args.examples_per_chapter)
+    bank.save(args.output)
+
+    print(f"Example bank with {len(bank)} examples ({len(bank.examples)} chapters) saved to {args.output}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,229 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Thread-safe record of call latencies with percentile summaries."""
+
+    def __init__(self, max_samples: int = 10000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile of the recorded latencies, or None if empty."""
+        with self._lock:
+            if not self._samples:
+                return None
+            return float(np.percentile(self._samples, p))
+
+    def summary(self) -> Dict[str, float]:
+        """Return count, mean, p50, p95, p99 and max latency (in seconds)."""
+        with self._lock:
+            samples = np.array(self._samples)
+        if len(samples) == 0:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "mean": float(samples.mean()),
+            "p50": float(np.percentile(samples, 50)),
+            "p95": float(np.percentile(samples, 95)),
+            "p99": float(np.percentile(samples, 99)),
+            "max": float(samples.max())
+        }
+
+
+class CircuitBreaker:
+    """
+    Pauses dispatch when the error rate over the last calls exceeds a threshold.
+
+    While open, wait() blocks until the cooldown has elapsed; the error window is
+    then cleared so the next calls probe the service again.
+    """
+
+    def __init__(self, window: int = 20, error_threshold: float = 0.5,
+                 min_calls: int = 5, cooldown: float = 30.0):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.trips = 0
+        self._results = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._results:
+                return 0.0
+            return 1 - sum(self._results) / len(self._results)
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            self._results.append(success)
+            if len(self._results) < self.min_calls:
+                return
+            error_rate = 1 - sum(self._results) / len(self._results)
+            if error_rate >= self.error_threshold and time.monotonic() >= self._open_until:
+                self._open_until = time.monotonic() + self.cooldown
+                self._results.clear()
+                self.trips += 1
+                print(f"Circuit breaker open: error rate {error_rate:.0%}, pausing dispatch for {self.cooldown:.0f}s")
+
+    def wait(self) -> None:
+        """Block until the breaker is closed."""
+        with self._lock:
+            remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class HedgedInvoker:
+    """
+    Calls a function with a per-request deadline and hedged duplicate requests.
+
+    When a call has not answered after the hedge_percentile latency of previous
+    calls, a duplicate is dispatched and whichever response arrives first is kept.
+    Calls that exceed the deadline raise TimeoutError; their threads are left to
+    finish in the background.
+
+    Args:
+        fn: Function to call with a single argument (e.g. chain.invoke)
+        deadline: Maximum seconds to wait for a response, including hedges (None waits forever)
+        hedge_percentile: Latency percentile after which a duplicate request is sent
+        max_hedges: Maximum duplicate requests per call (0 disables hedging)
+        min_samples: Number of observed latencies before hedging starts
+        breaker: Circuit breaker consulted before each dispatch
+        max_workers: Worker threads (stalled calls keep theirs until they return)
+    """
+
+    def __init__(self,
+                 fn: Callable[[Any], Any],
+                 deadline: Optional[float] = 60.0,
+                 hedge_percentile: float = 95.0,
+                 max_hedges: int = 1,
+                 min_samples: int = 10,
+                 breaker: Optional[CircuitBreaker] = None,
+                 max_workers: int = 16):
+        self.fn = fn
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self.min_samples = min_samples
+        self.breaker = breaker or CircuitBreaker()
+
+        # Latência de cada tentativa (define o limiar de hedge) e de cada chamada completa
+        self.attempt_latencies = LatencyTracker()
+        self.call_latencies = LatencyTracker()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.errors = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _timed(self, inputs: Any) -> Any:
+        start = time.perf_counter()
+        result = self.fn(inputs)
+        self.attempt_latencies.record(time.perf_counter() - start)
+        return result
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.max_hedges <= 0 or len(self.attempt_latencies) < self.min_samples:
+            return None
+        return self.attempt_latencies.percentile(self.hedge_percentile)
+
+    def invoke(self, inputs: Any) -> Any:
+        """
+        Call fn(inputs), returning the first successful response.
+
+        Raises:
+            TimeoutError: If no response arrives before the deadline
+            Exception: The last error, if every attempt failed
+        """
+        self.breaker.wait()
+
+        start = time.perf_counter()
+        deadline_at = start + self.deadline if self.deadline is not None else None
+        hedge_delay = self._hedge_delay()
+        next_hedge_at = start + hedge_delay if hedge_delay is not None else None
+
+        primary = self._executor.submit(self._timed, inputs)
+        pending = {primary}
+        hedges_sent = 0
+        last_error = None
+
+        while pending:
+            now = time.perf_counter()
+            wake_times = [t for t in (deadline_at, next_hedge_at) if t is not None]
+            timeout = max(0.0, min(wake_times) - now) if wake_times else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    self.call_latencies.record(time.perf_counter() - start)
+                    self.breaker.record(True)
+                    if future is not primary:
+                        self.hedge_wins += 1
+                    return future.result()
+                last_error = future.exception()
+
+            now = time.perf_counter()
+            if deadline_at is not None and now >= deadline_at:
+                break
+
+            # Enviar uma requisição duplicada quando a tentativa atual passa do percentil
+            # de latência, ou imediatamente quando todas as tentativas falharam
+            hedge_due = next_hedge_at is not None and now >= next_hedge_at
+            if (hedge_due or not pending) and hedges_sent < self.max_hedges:
+                pending.add(self._executor.submit(self._timed, inputs))
+                hedges_sent += 1
+                self.hedges += 1
+                next_hedge_at = now + hedge_delay if hedge_delay is not None and hedges_sent < self.max_hedges else None
+            elif hedge_due:
+                next_hedge_at = None
+
+        self.call_latencies.record(time.perf_counter() - start)
+        self.breaker.record(False)
+        if pending:
+            self.timeouts += 1
+            raise TimeoutError(f"No response within {self.deadline:.1f}s deadline")
+        self.errors += 1
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        """Return tail latency statistics and hedging/timeout counters."""
+        summary = self.call_latencies.summary()
+        summary.update({
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "breaker_trips": self.breaker.trips
+        })
+        return summary
+
+    def shutdown(self) -> None:
+        """Stop the worker threads without waiting for stalled calls."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def format_latency_stats(stats: Dict[str, Any]) -> str:
+    """Format HedgedInvoker.stats() as a single report line."""
+    if not stats.get("count"):
+        return "LLM latency: no calls"
+    return (f"LLM latency over {stats['count']} calls: p50 {stats['p50']:.2f}s | "
+            f"p95 {stats['p95']:.2f}s | p99 {stats['p99']:.2f}s | max {stats['max']:.2f}s | "
+            f"hedges {stats['hedges']} ({stats['hedge_wins']} won) | timeouts {stats['timeouts']} | "
+            f"errors {stats['errors']} | breaker trips {stats['breaker_trips']}")
@@ -27,7 +27,7 @@ def run_analysis():
 
 def run_prompt_engineering():
     """Run the prompt engineering script."""
-    print("\nGenerating prompt examples for LLM training...")
+    print("\nBuilding the few-shot example bank...")
     subprocess.run(["python", "prompt_engineering.py"])
 
 def run_main(args):
@@ -47,6 +47,34 @@ def run_main(args):
         cmd.extend(["--batch-size", str(args.batch_size)])
     if args.max_similar:
         cmd.extend(["--max-similar", str(args.max_similar)])
+    if args.patch_output:
+        cmd.extend(["--patch-output", args.patch_output])
+    if args.no_validation:
+        cmd.append("--no-validation")
+    if args.max_reinference is not None:
+        cmd.extend(["--max-reinference", str(args.max_reinference)])
+    if args.no_fast_fill:
+        cmd.append("--no-fast-fill")
+    if args.fast_fill_min_support is not None:
+        cmd.extend(["--fast-fill-min-support", str(args.fast_fill_min_support)])
+    if args.example_bank:
+        cmd.extend(["--example-bank", args.example_bank])
+    if args.example_tokens is not None:
+        cmd.extend(["--example-tokens", str(args.example_tokens)])
+    if args.explanations:
+        cmd.extend(["--explanations", args.explanations])
+    if args.explanations_table:
+        cmd.extend(["--explanations-table", args.explanations_table])
+    if args.request_deadline is not None:
+        cmd.extend(["--request-deadline", str(args.request_deadline)])
+    if args.hedge_percentile is not None:
+        cmd.extend(["--hedge-percentile", str(args.hedge_percentile)])
+    if args.max_hedges is not None:
+        cmd.extend(["--max-hedges", str(args.max_hedges)])
+    if args.breaker_threshold is not None:
+        cmd.extend(["--breaker-threshold", str(args.breaker_threshold)])
+    if args.breaker_cooldown is not None:
+        cmd.extend(["--breaker-cooldown", str(args.breaker_cooldown)])
     
     subprocess.run(cmd)
 
@@ -55,7 +83,7 @@ def show_menu():
     print("\n===== Import Data Completion Agent =====")
     print("1. Run data completion agent (main.py)")
     print("2. Analyze missing data patterns (analyze.py)")
-    print("3. Generate prompt examples (prompt_engineering.py)")
+    print("3. Build few-shot example bank (prompt_engineering.py)")
     print("4. Exit")
     choice = input("\nEnter your choice (1-4): ")
     return choice
@@ -69,6 +97,20 @@ def parse_args():
     parser.add_argument('--model', type=str, help='LLM model to use')
     parser.add_argument('--batch-size', type=int, help='Number of rows to process in each batch')
     parser.add_argument('--max-similar', type=int, help='Maximum number of similar rows to include in each prompt')
+    parser.add_argument('--patch-output', type=str, help='Path to save a sparse patch CSV with only the changed cells')
+    parser.add_argument('--no-validation', action='store_true', help='Disable validation of inferred values against the reference data')
+    parser.add_argument('--max-reinference', type=int, help='Number of re-inference rounds for values rejected by validation')
+    parser.add_argument('--no-fast-fill', action='store_true', help='Always call the LLM, even for values that are unambiguous for the consignee')
+    parser.add_argument('--fast-fill-min-support', type=int, help='Minimum number of reference rows behind a value filled without the LLM')
+    parser.add_argument('--example-bank', type=str, help='Path to the few-shot example bank')
+    parser.add_argument('--example-tokens', type=int, help='Token budget for the few-shot examples in each prompt')
+    parser.add_argument('--explanations', type=str, choices=['none', 'short', 'full'], help='Explanation column: none, short (codes referencing a side table) or full (text)')
+    parser.add_argument('--explanations-table', type=str, help='Path to save the explanation side table')
+    parser.add_argument('--request-deadline', type=float, help='Maximum seconds to wait for each LLM request')
+    parser.add_argument('--hedge-percentile', type=float, help='Latency percentile after which a duplicate LLM request is sent')
+    parser.add_argument('--max-hedges', type=int, help='Maximum duplicate requests per LLM call (0 disables hedging)')
+    parser.add_argument('--breaker-threshold', type=float, help='LLM error rate that pauses dispatch (circuit breaker)')
+    parser.add_argument('--breaker-cooldown', type=float, help='Seconds to pause LLM dispatch when the circuit breaker opens')
     parser.add_argument('--non-interactive', action='store_true', help='Run in non-interactive mode')
     
     return parser.parse_args()
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 
 from utils import load_csv
 from agent import DataCompletionAgent
+from prompt_engineering import load_or_build_example_bank
+from explanations import VERBOSITY_LEVELS
 
 def main():
     # Load environment variables
@@ -18,6 +20,20 @@ def main():
     parser.add_argument('--model', type=str, default='gpt-3.5-turbo', help='LLM model to use')
     parser.add_argument('--batch-size', type=int, default=10, help='Number of rows to process in each batch')
     parser.add_argument('--max-similar', type=int, default=5, help='Maximum number of similar rows to include in each prompt')
+    parser.add_argument('--patch-output', type=str, default=None, help='Optional path to save a sparse patch CSV with only the changed cells')
+    parser.add_argument('--no-validation', action='store_true', help='Disable validation of inferred values against the reference data')
+    parser.add_argument('--max-reinference', type=int, default=1, help='Number of re-inference rounds for values rejected by validation')
+    parser.add_argument('--no-fast-fill', action='store_true', help='Always call the LLM, even for values that are unambiguous for the consignee')
+    parser.add_argument('--fast-fill-min-support', type=int, default=3, help='Minimum number of reference rows behind a value filled without the LLM')
+    parser.add_argument('--example-bank', type=str, default=None, help='Path to the few-shot example bank (built from the input files if it does not exist)')
+    parser.add_argument('--example-tokens', type=int, default=600, help='Token budget for the few-shot examples in each prompt')
+    parser.add_argument('--explanations', type=str, choices=VERBOSITY_LEVELS, default='full', help='Explanation column: none, short (codes referencing a side table) or full (text)')
+    parser.add_argument('--explanations-table', type=str, default=None, help='Path to save the explanation side table (default: next to the output file)')
+    parser.add_argument('--request-deadline', type=float, default=60.0, help='Maximum seconds to wait for each LLM request')
+    parser.add_argument('--hedge-percentile', type=float, default=95.0, help='Latency percentile after which a duplicate LLM request is sent')
+    parser.add_argument('--max-hedges', type=int, default=1, help='Maximum duplicate requests per LLM call (0 disables hedging)')
+    parser.add_argument('--breaker-threshold', type=float, default=0.5, help='LLM error rate that pauses dispatch (circuit breaker)')
+    parser.add_argument('--breaker-cooldown', type=float, default=30.0, help='Seconds to pause LLM dispatch when the circuit breaker opens')
     
     args = parser.parse_args()
     
@@ -43,23 +59,49 @@ def main():
     match_columns = ["ncm_code", "country_origin_acronym", "transport_mode_pt", 
                     "clearance_place_entry", "consignee_code", "shipper_name"]
     
+    # Load the few-shot example bank, if requested
+    example_bank = None
+    if args.example_bank:
+        example_bank = load_or_build_example_bank(args.example_bank, reference_df)
+    
     # Initialize the agent
-    agent = DataCompletionAgent(model_name=args.model)
+    agent = DataCompletionAgent(model_name=args.model, example_bank=example_bank,
+                                example_token_budget=args.example_tokens,
+                                request_deadline=args.request_deadline,
+                                hedge_percentile=args.hedge_percentile,
+                                max_hedges=args.max_hedges,
+                                breaker_threshold=args.breaker_threshold,
+                                breaker_cooldown=args.breaker_cooldown)
     
     # Process the dataframe
     print("Processing dataframe to complete missing values with explanations...")
-    completed_df = agent.process_dataframe(
-        target_df,
-        reference_df,
-        match_columns,
-        batch_size=args.batch_size,
-        max_similar_rows=args.max_similar
-    )
+    try:
+        completed_df = agent.process_dataframe(
+            target_df,
+            reference_df,
+            match_columns,
+            batch_size=args.batch_size,
+            max_similar_rows=args.max_similar,
+            patch_path=args.patch_output,
+            validate=not args.no_validation,
+            max_reinference_attempts=args.max_reinference,
+            fast_fill=not args.no_fast_fill,
+            fast_fill_min_support=args.fast_fill_min_support,
+            explanation_verbosity=args.explanations
+        )
+    finally:
+        agent.close()
     
     # Save the completed dataframe
     print(f"Saving completed dataframe with explanations to {args.output}")
     completed_df.to_csv(args.output, index=False)
     
+    # Explicações em formato curto referenciam a tabela de textos internados
+    if args.explanations == "short":
+        table_path = args.explanations_table or f"{os.path.splitext(args.output)[0]}_explicacoes.csv"
+        print(f"Saving explanation table to {table_path}")
+        agent.explanation_store.save(table_path)
+    
     print("Done!")
 
 if __name__ == "__main__":
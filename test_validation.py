@@ -0,0 +1,35 @@
+import pandas as pd
+
+from validation import ValidationEngine
+
+REFERENCE = pd.DataFrame({
+    "transport_mode_pt": ["MARITIMA", "AEREA"],
+    "clearance_place_entry": ["SANTOS", "GUARULHOS"]
+})
+
+
+def test_unseen_original_value_does_not_reject_inferred_pair():
+    engine = ValidationEngine.from_reference(REFERENCE)
+    batch = pd.DataFrame({"transport_mode_pt": ["MARITIMA"], "clearance_place_entry": ["ITAJAI"]})
+    inferred = pd.DataFrame({"transport_mode_pt": [True], "clearance_place_entry": [False]})
+
+    reasons = engine.validate(batch, inferred)
+
+    assert reasons.isna().all().all()
+
+
+def test_known_original_value_rejects_unseen_pair():
+    engine = ValidationEngine.from_reference(REFERENCE)
+    batch = pd.DataFrame({"transport_mode_pt": ["MARITIMA"], "clearance_place_entry": ["GUARULHOS"]})
+    inferred = pd.DataFrame({"transport_mode_pt": [True], "clearance_place_entry": [False]})
+
+    reasons = engine.validate(batch, inferred)
+
+    assert reasons.at[0, "transport_mode_pt"] == "combinação transport_mode_pt/clearance_place_entry nunca observada"
+    assert pd.isna(reasons.at[0, "clearance_place_entry"])
+
+
+if __name__ == "__main__":
+    test_unseen_original_value_does_not_reject_inferred_pair()
+    test_known_original_value_rejects_unseen_pair()
+    print("Validation checks passed!")
@@ -1,5 +1,7 @@
 import pandas as pd
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
+
+from cnpj import ConsigneeIndex
 
 def load_csv(file_path: str) -> pd.DataFrame:
     """Load CSV file into a pandas DataFrame."""
@@ -18,7 +20,24 @@ def find_missing_data(df: pd.DataFrame) -> Dict[int, List[str]]:
             missing_data[idx] = missing_cols
     return missing_data
 
-def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_columns: List[str]) -> pd.DataFrame:
+def find_missing_patterns(missing_data_map: Dict[int, List[str]]) -> Dict[Tuple[str, ...], int]:
+    """
+    Count how many rows share each combination of missing columns.
+    
+    Args:
+        missing_data_map: Output of find_missing_data
+        
+    Returns:
+        Dictionary with sorted tuples of missing columns as keys and row counts as values
+    """
+    missing_patterns = {}
+    for idx, missing_cols in missing_data_map.items():
+        pattern = tuple(sorted(missing_cols))
+        missing_patterns[pattern] = missing_patterns.get(pattern, 0) + 1
+    return missing_patterns
+
+def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_columns: List[str],
+                      consignee_index: Optional[ConsigneeIndex] = None) -> pd.DataFrame:
     """
     Find rows in the reference DataFrame that match the target row on specified columns.
     
@@ -26,10 +45,19 @@ def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_c
         target_row: Row with missing data
         reference_df: DataFrame to search in
         match_columns: Columns to use for matching
+        consignee_index: Optional index of normalized CNPJs built from reference_df,
+            used to match consignee_code regardless of formatting
         
     Returns:
         DataFrame with matching rows
     """
+    # Chave normalizada e raiz do CNPJ do registro alvo, quando disponíveis
+    target_key = None
+    target_root = None
+    if consignee_index is not None and 'consignee_code' in target_row.index:
+        target_key = consignee_index.key_for(target_row['consignee_code'])
+        target_root = consignee_index.root_for(target_row['consignee_code'])
+    
     # Abordagem mais flexível: priorizamos correspondências em colunas importantes,
     # mas não exigimos que todas correspondam
     
@@ -45,6 +73,12 @@ def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_c
     
     # Se temos muitos resultados (>20), podemos aplicar filtros adicionais
     if len(filtered_df) > 20:
+        # Filtrar pelo mesmo importador (raiz do CNPJ), se disponível
+        if target_root is not None:
+            root_filtered = filtered_df[filtered_df.index.isin(consignee_index.rows_for_root(target_root))]
+            if len(root_filtered) > 5:
+                filtered_df = root_filtered
+        
         # Filtrar por modo de transporte, se disponível
         if 'transport_mode_pt' in target_row.index and not pd.isna(target_row['transport_mode_pt']):
             trans_filtered = filtered_df[filtered_df['transport_mode_pt'] == target_row['transport_mode_pt']]
@@ -58,7 +92,11 @@ def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_c
             if len(place_filtered) > 5:
                 filtered_df = place_filtered
     
-    # Se não encontramos nada com os filtros de alta prioridade, tentamos apenas NCM ou país
+    # Se não encontramos nada com os filtros de alta prioridade, tentamos o mesmo
+    # importador (raiz do CNPJ) e depois apenas NCM ou país
+    if len(filtered_df) == 0 and target_root is not None:
+        filtered_df = reference_df.loc[consignee_index.rows_for_root(target_root)]
+    
     if len(filtered_df) == 0:
         if 'ncm_code' in target_row.index and not pd.isna(target_row['ncm_code']):
             filtered_df = reference_df[reference_df['ncm_code'] == target_row['ncm_code']]
@@ -77,6 +115,12 @@ def find_similar_rows(target_row: pd.Series, reference_df: pd.DataFrame, match_c
         score = 0
         # Pontuamos com base nas correspondências exatas em cada coluna
         for col in match_columns:
+            if col == 'consignee_code' and target_key is not None:
+                # Comparação pelo CNPJ normalizado, independente da formatação
+                row_key = consignee_index.keys.at[idx]
+                if not pd.isna(row_key) and row_key == target_key:
+                    score += 1
+                continue
             if col in target_row.index and col in row.index and not pd.isna(target_row[col]) and not pd.isna(row[col]):
                 if target_row[col] == row[col]:
                     if col in ['ncm_code', 'country_origin_acronym']:
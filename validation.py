@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from cnpj import is_valid_cnpj
+
+# Colunas com domínio fechado: valores inferidos precisam já ter sido observados
+CATEGORICAL_COLUMNS = ["transport_mode_pt", "clearance_place_entry", "country_origin_acronym"]
+
+# Pares de colunas cuja combinação precisa ter sido observada nos dados de referência
+CONSISTENCY_PAIRS = [("transport_mode_pt", "clearance_place_entry")]
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Convert values to stripped strings so reference and LLM values compare equal."""
+    return values.astype(object).where(values.isna(), values.astype(str).str.strip())
+
+
+class ValidationEngine:
+    """
+    Rejects impossible inferences using the domains observed in the reference data.
+
+    Three checks are applied to each batch of candidate rows:
+    - CNPJ checksum verification for consignee_code
+    - Categorical membership for closed-domain columns
+    - Cross-field consistency for column pairs observed together
+
+    A pair is only rejected when at least one side was inferred and the other
+    side is a known value: an original value missing from the reference data
+    means the combination is unknown, not impossible.
+    """
+
+    def __init__(self,
+                 domains: Dict[str, Set[str]],
+                 observed_pairs: Dict[Tuple[str, str], pd.MultiIndex]):
+        self.domains = domains
+        self.observed_pairs = observed_pairs
+
+    @classmethod
+    def from_reference(cls,
+                       reference_df: pd.DataFrame,
+                       categorical_columns: List[str] = CATEGORICAL_COLUMNS,
+                       consistency_pairs: List[Tuple[str, str]] = CONSISTENCY_PAIRS) -> "ValidationEngine":
+        """
+        Build the validation domains from the reference DataFrame.
+
+        Args:
+            reference_df: Reference DataFrame with complete data
+            categorical_columns: Columns checked for membership in the observed domain
+            consistency_pairs: Column pairs checked against the observed combinations
+
+        Returns:
+            ValidationEngine for the reference data
+        """
+        domains = {
+            col: set(_as_text(reference_df[col]).dropna())
+            for col in categorical_columns
+            if col in reference_df.columns
+        }
+
+        observed_pairs = {}
+        for col_a, col_b in consistency_pairs:
+            if col_a in reference_df.columns and col_b in reference_df.columns:
+                pairs = reference_df[[col_a, col_b]].apply(_as_text).dropna().drop_duplicates()
+                observed_pairs[(col_a, col_b)] = pd.MultiIndex.from_frame(pairs)
+
+        return cls(domains, observed_pairs)
+
+    def validate(self, batch_df: pd.DataFrame, inferred: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Validate a batch of candidate rows (original values merged with inferences).
+
+        Args:
+            batch_df: DataFrame with the candidate rows
+            inferred: Boolean DataFrame aligned with batch_df marking the inferred cells
+                (if omitted, every cell is treated as inferred)
+
+        Returns:
+            DataFrame with the same index and columns as batch_df, holding the
+            rejection reason for each invalid cell and None for valid cells
+        """
+        reasons = pd.DataFrame(None, index=batch_df.index, columns=batch_df.columns, dtype=object)
+        if inferred is None:
+            inferred = pd.DataFrame(True, index=batch_df.index, columns=batch_df.columns)
+        else:
+            inferred = inferred.reindex(index=batch_df.index, columns=batch_df.columns, fill_value=False)
+
+        if "consignee_code" in batch_df.columns:
+            codes = batch_df["consignee_code"]
+            invalid = codes.notna() & ~is_valid_cnpj(codes) & inferred["consignee_code"]
+            reasons.loc[invalid, "consignee_code"] = "CNPJ com dígitos verificadores inválidos"
+
+        for col, domain in self.domains.items():
+            if col not in batch_df.columns:
+                continue
+            values = _as_text(batch_df[col])
+            invalid = values.notna() & ~values.isin(domain) & inferred[col]
+            reasons.loc[invalid, col] = f"valor nunca observado em {col}"
+
+        for (col_a, col_b), observed in self.observed_pairs.items():
+            if col_a not in batch_df.columns or col_b not in batch_df.columns:
+                continue
+            pairs = batch_df[[col_a, col_b]].apply(_as_text)
+            present = pairs.notna().all(axis=1)
+            seen = pd.MultiIndex.from_frame(pairs.fillna("")).isin(observed)
+
+            # Cada lado precisa ter sido inferido ou ser um valor conhecido da referência;
+            # um valor original nunca observado torna a combinação desconhecida
+            checkable = inferred[col_a] | inferred[col_b]
+            for col, level in ((col_a, 0), (col_b, 1)):
+                known = pairs[col].isin(self.domains.get(col, observed.get_level_values(level)))
+                checkable &= inferred[col] | known
+
+            invalid = present & ~seen & checkable
+            message = f"combinação {col_a}/{col_b} nunca observada"
+            for col in (col_a, col_b):
+                # Só marcamos os valores inferidos, sem sobrescrever um motivo mais específico
+                reasons.loc[invalid & inferred[col] & reasons[col].isna(), col] = message
+
+        return reasons
@@ -0,0 +1,120 @@
+import os
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Colunas do arquivo de patch (formato longo: uma linha por célula alterada)
+PATCH_COLUMNS = ["row_index", "column", "value"]
+
+
+class ColumnarWriteBuffer:
+    """
+    Accumulates inferred cells in column-oriented buffers and applies them
+    to a DataFrame in a single vectorized assignment per column.
+    """
+
+    def __init__(self):
+        self._indices: Dict[str, List[Any]] = defaultdict(list)
+        self._values: Dict[str, List[Any]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return sum(len(idx) for idx in self._indices.values())
+
+    def add(self, idx: Any, col: str, value: Any) -> None:
+        """Queue a single cell update for the next flush."""
+        self._indices[col].append(idx)
+        self._values[col].append(value)
+
+    def add_row(self, idx: Any, values: Dict[str, Any]) -> None:
+        """Queue every column/value pair of a row for the next flush."""
+        for col, value in values.items():
+            self.add(idx, col, value)
+
+    def flush(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply all buffered updates to df in place and clear the buffer.
+
+        Args:
+            df: DataFrame to update (its index must contain the buffered labels)
+
+        Returns:
+            DataFrame in patch format (row_index, column, value) with the applied cells
+        """
+        # Resolver todas as posições antes de alterar df: get_indexer devolve -1 para
+        # rótulos ausentes, e iloc[-1] gravaria silenciosamente na última linha
+        positions_by_col = {}
+        for col, indices in self._indices.items():
+            positions = df.index.get_indexer(indices)
+            if (positions < 0).any():
+                missing = [label for label, pos in zip(indices, positions) if pos < 0]
+                raise KeyError(f"Row labels not found in DataFrame index: {missing}")
+            positions_by_col[col] = positions
+
+        patches = []
+        for col, indices in self._indices.items():
+            values = np.empty(len(indices), dtype=object)
+            values[:] = self._values[col]
+            positions = positions_by_col[col]
+
+            if col not in df.columns:
+                df[col] = pd.Series(np.nan, index=df.index, dtype=object)
+            elif df[col].dtype != object:
+                # Colunas numéricas (ou totalmente vazias) precisam aceitar
+                # os valores textuais vindos do LLM
+                df[col] = df[col].astype(object)
+
+            df.iloc[positions, df.columns.get_loc(col)] = values
+
+            patches.append(pd.DataFrame({
+                "row_index": indices,
+                "column": col,
+                "value": values
+            }))
+
+        self._indices.clear()
+        self._values.clear()
+
+        if not patches:
+            return pd.DataFrame(columns=PATCH_COLUMNS)
+        return pd.concat(patches, ignore_index=True)
+
+
+def write_patch(patch_df: pd.DataFrame, path: str, append: bool = False) -> None:
+    """
+    Write (or append) changed cells to a sparse patch CSV file.
+
+    Args:
+        patch_df: DataFrame in patch format (row_index, column, value)
+        path: Path of the patch file
+        append: Append to an existing file instead of overwriting it
+    """
+    write_header = not append or not os.path.exists(path)
+    patch_df.to_csv(path, mode="a" if append else "w", header=write_header, index=False)
+
+
+def apply_patch(df: pd.DataFrame, patch_path: str) -> pd.DataFrame:
+    """
+    Apply a sparse patch file to a copy of the original DataFrame.
+
+    Args:
+        df: Original DataFrame (the target file the patch was generated from)
+        patch_path: Path of the patch CSV file
+
+    Returns:
+        DataFrame with the patched cells
+    """
+    # Sem conversão de NA: valores como "NA" (Namíbia) ou "" precisam ser preservados
+    patch_df = pd.read_csv(patch_path, dtype={"column": str, "value": object},
+                           keep_default_na=False, na_values=[])
+    result_df = df.copy()
+
+    buffer = ColumnarWriteBuffer()
+    # Quando a mesma célula aparece mais de uma vez, vale a última escrita
+    patch_df = patch_df.drop_duplicates(subset=["row_index", "column"], keep="last")
+    for row_index, col, value in patch_df[PATCH_COLUMNS].itertuples(index=False):
+        buffer.add(row_index, col, value)
+    buffer.flush(result_df)
+
+    return result_df